@@ -4,72 +4,149 @@ Main FastAPI application with RAG system
 """
 
 import os
+import hmac
+import time
+import asyncio
 from pathlib import Path
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 
+# Load environment variables (before the routers read their configuration)
+load_dotenv()
+
 from .services.pdf_parser import PDFParser
 from .services.embedding_service import EmbeddingService
 from .services.rag_service import RAGService
+from .services.shared_index import (
+    index_version, load_or_build, register_worker, unregister_worker, worker_memory
+)
+from .middleware.admission import AdmissionController, AdmissionControlMiddleware
 from .routers import chat
 
-# Load environment variables
-load_dotenv()
-
 # Global services (initialized on startup)
 embedding_service = None
 rag_service = None
 
+# Built once per host and memory-mapped by every worker
+INDEX_DIR = Path(os.getenv("FERBOT_INDEX_DIR", str(Path(__file__).parent / "data" / "index")))
+# Parsed CV markdown, keyed by PDF content hash and parser version
+PARSE_CACHE_DIR = Path(os.getenv("FERBOT_PARSE_CACHE_DIR", str(Path(__file__).parent / "data" / "cache")))
+# Bearer token for /api/metrics (disabled, 404, unless set)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 150
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Initialize services on startup"""
-    global embedding_service, rag_service
 
-    print("[*] Starting FerBot...")
+class Ingestion:
+    """Progress of the startup ingestion, for health and readiness checks"""
 
-    # 1. Initialize embedding service
-    embedding_service = EmbeddingService()
-    print("[OK] Embedding service initialized")
+    def __init__(self):
+        self.status = "pending"  # pending | running | ready | failed
+        self.error = None
+        self.started_at = None
+        self.seconds = None
+        self.task = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def snapshot(self) -> dict:
+        return {
+            "status": self.status,
+            "error": self.error,
+            "seconds": self.seconds if self.seconds is not None else (
+                round(time.monotonic() - self.started_at, 2) if self.started_at else None
+            )
+        }
+
+
+ingestion = Ingestion()
+
+
+async def ingest_cv():
+    """Attach to the shared index, building it first if no worker has yet"""
+    ingestion.status = "running"
+    ingestion.started_at = time.monotonic()
 
-    # 2. Parse CV
     cv_path = Path(__file__).parent / "data" / "CV_LinkedIn.pdf"
     if not cv_path.exists():
         print(f"[WARNING] CV not found at {cv_path}")
         print("[INFO] Please add CV_LinkedIn.pdf to app/data/")
-    else:
-        parser = PDFParser()
-        cv_data = parser.parse_cv(str(cv_path))
+        ingestion.status, ingestion.error = "failed", "CV not found"
+        return
+
+    async def build():
+        # Parsed in a worker process; unchanged CVs come from the markdown cache
+        cv_data = await PDFParser.parse_cv_cached(str(cv_path), PARSE_CACHE_DIR)
+        if not cv_data["success"]:
+            raise RuntimeError(f"Error parsing CV: {cv_data.get('error')}")
+        print(
+            f"[OK] CV {'loaded from cache' if cv_data.get('cached') else 'parsed successfully'} "
+            f"({len(cv_data['content'])} chars)"
+        )
+
+        chunks = PDFParser.chunk_content(cv_data["content"], chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP)
+        print(f"[OK] Created {len(chunks)} chunks")
+
+        # Checkpointed next to the index: an interrupted build resumes, not restarts
+        checkpoint_path = INDEX_DIR / f"{version}.embeddings.ndjson"
+        chunk_texts = [chunk["text"] for chunk in chunks]
+        embeddings = await embedding_service.create_embeddings_batch(chunk_texts, checkpoint_path)
+        print(f"[OK] Created {len(embeddings)} embeddings")
+        if len(embeddings) == len(chunks):
+            checkpoint_path.unlink(missing_ok=True)
+        return chunks, embeddings
+
+    try:
+        version = index_version(
+            cv_path,
+            model=embedding_service.model, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP
+        )
+        index, built = await load_or_build(
+            INDEX_DIR, version, build,
+            meta={"source": cv_path.name, "embedding_model": embedding_service.model}
+        )
+        embedding_service.attach_index(index)
+        print(f"[OK] Index {version} {'built' if built else 'attached'} ({len(index)} chunks)")
+        ingestion.status = "ready"
+    except Exception as e:
+        print(f"[ERROR] {e}")
+        ingestion.status, ingestion.error = "failed", str(e)
+    finally:
+        ingestion.seconds = round(time.monotonic() - ingestion.started_at, 2)
 
-        if cv_data["success"]:
-            print(f"[OK] CV parsed successfully ({len(cv_data['content'])} chars)")
 
-            # 3. Create chunks
-            chunks = parser.chunk_content(cv_data["content"], chunk_size=800, overlap=150)
-            print(f"[OK] Created {len(chunks)} chunks")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize services on startup"""
+    global embedding_service, rag_service
 
-            # 4. Create embeddings
-            chunk_texts = [chunk["text"] for chunk in chunks]
-            embeddings = await embedding_service.create_embeddings_batch(chunk_texts)
-            print(f"[OK] Created {len(embeddings)} embeddings")
+    print("[*] Starting FerBot...")
 
-            # 5. Cache embeddings
-            embedding_service.cache_embeddings(chunks, embeddings)
-            print("[OK] Embeddings cached")
-        else:
-            print(f"[ERROR] Error parsing CV: {cv_data.get('error')}")
+    # 1. Initialize embedding service
+    embedding_service = EmbeddingService()
+    print("[OK] Embedding service initialized")
 
-    # 6. Initialize RAG service
+    # 2. Initialize RAG service
     rag_service = RAGService(embedding_service)
     print("[OK] RAG service initialized")
 
-    print("[*] FerBot ready!")
+    # 3. Ingest in the background: health checks are served meanwhile and
+    # /api/chat answers 503 until the index is attached
+    ingestion.task = asyncio.create_task(ingest_cv())
+    register_worker(INDEX_DIR)
+
+    print("[*] FerBot serving (CV ingestion in progress)")
 
     yield
 
     print("[*] Shutting down FerBot...")
+    ingestion.task.cancel()
+    unregister_worker(INDEX_DIR)
 
 
 # Create FastAPI app
@@ -80,6 +157,17 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Admission control: shed load before bodies are parsed (added before CORS so
+# rejections still carry CORS headers)
+admission = AdmissionController(
+    max_in_flight=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "8")),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "32")),
+    queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2.0")),
+    max_per_client=int(os.getenv("ADMISSION_MAX_PER_CLIENT", "2")),
+    precheck=chat.rate_limiter.is_limited
+)
+app.add_middleware(AdmissionControlMiddleware, controller=admission, paths=("/api/chat",))
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -108,3 +196,34 @@ async def root():
         "docs": "/docs",
         "status": "operational"
     }
+
+
+@app.get("/api/ready")
+async def ready():
+    """Readiness: 503 until the CV index is attached"""
+    status = ingestion.snapshot()
+    if ingestion.ready:
+        return status
+    return JSONResponse(status_code=503, content=status, headers={"Retry-After": "5"})
+
+
+def require_metrics_token(http_request: Request):
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    supplied = http_request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(supplied.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+
+@app.get("/api/metrics")
+async def metrics(http_request: Request):
+    """Load and quota counters for capacity tuning"""
+    require_metrics_token(http_request)
+    return {
+        "admission": admission.snapshot(),
+        "rate_limit": chat.rate_limiter.snapshot(),
+        "token_budget": chat.token_budget.snapshot(),
+        "ingestion": ingestion.snapshot(),
+        "index": embedding_service.index.meta if embedding_service and embedding_service.index else None,
+        "memory": worker_memory(INDEX_DIR)
+    }
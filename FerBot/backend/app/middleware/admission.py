@@ -0,0 +1,174 @@
+"""
+Admission Control
+ASGI middleware that sheds load before the request body is read or validated
+"""
+
+import json
+import math
+import time
+import asyncio
+from typing import Callable, Dict, Iterable, Optional
+
+
+class AdmissionController:
+    """
+    Global in-flight cap with a bounded wait queue, plus per-client checks.
+
+    Shared between the middleware (which enforces it) and the metrics
+    endpoint (which reports queue depth so capacity can be tuned).
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 8,
+        max_queue: int = 32,
+        queue_timeout: float = 2.0,
+        max_per_client: int = 2,
+        precheck: Optional[Callable[[str], bool]] = None
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_per_client = max_per_client
+        # precheck(client_ip) -> True rejects with 429 (e.g. rate limiter peek)
+        self.precheck = precheck
+
+        self.slots = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.per_client: Dict[str, int] = {}
+        self.avg_service_seconds = 1.0  # EWMA of admitted request durations
+        self.stats = {
+            "admitted": 0, "queued": 0, "rejected_queue_full": 0,
+            "rejected_timeout": 0, "rejected_client": 0, "rejected_precheck": 0
+        }
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free, from queue depth and service time"""
+        backlog = (self.waiting + 1) / self.max_in_flight
+        return max(1, math.ceil(backlog * self.avg_service_seconds))
+
+    def snapshot(self) -> Dict:
+        return {
+            **self.stats,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "avg_service_ms": int(self.avg_service_seconds * 1000)
+        }
+
+
+class AdmissionControlMiddleware:
+    """Enforce an AdmissionController on selected paths, ahead of body parsing"""
+
+    def __init__(
+        self,
+        app,
+        controller: AdmissionController,
+        paths: Iterable[str] = ("/api/",),
+        trust_forwarded_for: bool = False
+    ):
+        self.app = app
+        self.controller = controller
+        self.paths = tuple(paths)
+        self.trust_forwarded_for = trust_forwarded_for
+
+    def _client_ip(self, scope) -> str:
+        if self.trust_forwarded_for:
+            for name, value in scope.get("headers", []):
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def _reject(self, send, status: int, detail: str, retry_after: int):
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope.get("method") == "OPTIONS"
+            or not scope["path"].startswith(self.paths)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        ctl = self.controller
+        client_ip = self._client_ip(scope)
+
+        # Per-client checks first: cheap and no queue slot needed
+        if ctl.precheck is not None and ctl.precheck(client_ip):
+            ctl.stats["rejected_precheck"] += 1
+            await self._reject(
+                send, 429,
+                "Rate limit exceeded. Please wait a few minutes before trying again.",
+                60
+            )
+            return
+
+        if ctl.per_client.get(client_ip, 0) >= ctl.max_per_client:
+            ctl.stats["rejected_client"] += 1
+            await self._reject(send, 429, "Too many concurrent requests.", ctl.retry_after())
+            return
+
+        # Count the client from here on, whether queued or running
+        ctl.per_client[client_ip] = ctl.per_client.get(client_ip, 0) + 1
+        try:
+            if not await self._acquire_slot(send):
+                return
+
+            ctl.stats["admitted"] += 1
+            ctl.in_flight += 1
+            start = time.monotonic()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                elapsed = time.monotonic() - start
+                ctl.avg_service_seconds = 0.8 * ctl.avg_service_seconds + 0.2 * elapsed
+                ctl.in_flight -= 1
+                ctl.slots.release()
+        finally:
+            remaining = ctl.per_client[client_ip] - 1
+            if remaining:
+                ctl.per_client[client_ip] = remaining
+            else:
+                del ctl.per_client[client_ip]
+
+    async def _acquire_slot(self, send) -> bool:
+        """Take an in-flight slot, waiting in the bounded queue if needed"""
+        ctl = self.controller
+        if not ctl.slots.locked():
+            await ctl.slots.acquire()
+            return True
+
+        if ctl.waiting >= ctl.max_queue:
+            ctl.stats["rejected_queue_full"] += 1
+            await self._reject(
+                send, 503, "Service busy. Please try again shortly.", ctl.retry_after()
+            )
+            return False
+
+        ctl.stats["queued"] += 1
+        ctl.waiting += 1
+        try:
+            await asyncio.wait_for(ctl.slots.acquire(), timeout=ctl.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            ctl.stats["rejected_timeout"] += 1
+            await self._reject(
+                send, 503, "Service busy. Please try again shortly.", ctl.retry_after()
+            )
+            return False
+        finally:
+            ctl.waiting -= 1
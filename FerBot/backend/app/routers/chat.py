@@ -6,15 +6,34 @@ Handles chat requests for FerBot
 from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import List, Dict, Optional
-from datetime import datetime, timedelta
-from collections import defaultdict
+from datetime import timedelta
+
+from ..services.rate_limiter import create_rate_limiter
+from ..services.token_budget import TokenBudget, estimate_tokens
 
 router = APIRouter(prefix="/api", tags=["chat"])
 
-# Simple rate limiting (in-memory)
-rate_limit_store = defaultdict(list)
+# Rate limiting (O(1) per request, bounded number of tracked IPs).
+# RATE_LIMIT_BACKEND=redis|sqlite shares the counters across workers/instances.
 RATE_LIMIT = 10  # requests per window
 RATE_WINDOW = timedelta(minutes=5)
+RATE_LIMIT_MAX_KEYS = 100_000
+rate_limiter = create_rate_limiter(
+    RATE_LIMIT, RATE_WINDOW.total_seconds(), max_keys=RATE_LIMIT_MAX_KEYS
+)
+
+# Token budgets (per client and global, refilled over the same window)
+CLIENT_TOKEN_BUDGET = 20_000
+GLOBAL_TOKEN_BUDGET = 400_000
+PROMPT_OVERHEAD_TOKENS = 1_000  # System prompt + retrieved context
+MAX_TOKENS = 500
+HISTORY_LIMIT = 6
+DOWNGRADED_MAX_TOKENS = 200
+DOWNGRADED_HISTORY_LIMIT = 2
+token_budget = TokenBudget(
+    CLIENT_TOKEN_BUDGET, GLOBAL_TOKEN_BUDGET, RATE_WINDOW.total_seconds(),
+    max_keys=RATE_LIMIT_MAX_KEYS
+)
 
 
 class ChatRequest(BaseModel):
@@ -32,21 +51,17 @@ class ChatResponse(BaseModel):
 
 def check_rate_limit(client_ip: str) -> bool:
     """Check if client has exceeded rate limit"""
-    now = datetime.now()
-
-    # Clean old entries
-    rate_limit_store[client_ip] = [
-        timestamp for timestamp in rate_limit_store[client_ip]
-        if now - timestamp < RATE_WINDOW
-    ]
+    return rate_limiter.allow(client_ip)
 
-    # Check limit
-    if len(rate_limit_store[client_ip]) >= RATE_LIMIT:
-        return False
 
-    # Add current request
-    rate_limit_store[client_ip].append(now)
-    return True
+def estimate_request_tokens(request: ChatRequest, history_limit: int, max_tokens: int) -> int:
+    """Estimate total tokens (prompt + completion) a request will consume"""
+    history = (request.conversation_history or [])[-history_limit:] if history_limit else []
+    return (
+        estimate_tokens(request.question, *[str(m.get("content", "")) for m in history])
+        + PROMPT_OVERHEAD_TOKENS
+        + max_tokens
+    )
 
 
 @router.post("/chat", response_model=ChatResponse)
@@ -61,6 +76,17 @@ async def chat(request: ChatRequest, req: Request):
     Returns:
         ChatResponse with answer and sources
     """
+    # Import services (initialized in main.py)
+    from ..main import rag_service, ingestion
+
+    # Wait for the CV index while it is being ingested (checked before any quota is spent)
+    if ingestion.status in ("pending", "running"):
+        raise HTTPException(
+            status_code=503,
+            detail="FerBot is starting up. Please try again in a few seconds.",
+            headers={"Retry-After": "5"}
+        )
+
     # Get client IP
     client_ip = req.client.host if req.client else "unknown"
 
@@ -84,16 +110,34 @@ async def chat(request: ChatRequest, req: Request):
             detail="Question too long. Maximum 500 characters."
         )
 
-    # Import services (initialized in main.py)
-    from ..main import rag_service
+    # Check token budget (downgrade to a shorter answer before rejecting)
+    full_estimate = estimate_request_tokens(request, HISTORY_LIMIT, MAX_TOKENS)
+    reserved = token_budget.reserve(
+        client_ip,
+        full_estimate,
+        reduced_estimate=estimate_request_tokens(
+            request, DOWNGRADED_HISTORY_LIMIT, DOWNGRADED_MAX_TOKENS
+        )
+    )
+    if not reserved:
+        raise HTTPException(
+            status_code=429,
+            detail="Token budget exceeded. Please wait a few minutes before trying again."
+        )
+    downgraded = reserved < full_estimate
 
     # Generate response
     result = await rag_service.generate_response(
         question=request.question,
         language=request.language,
-        conversation_history=request.conversation_history
+        conversation_history=request.conversation_history,
+        max_tokens=DOWNGRADED_MAX_TOKENS if downgraded else MAX_TOKENS,
+        history_limit=DOWNGRADED_HISTORY_LIMIT if downgraded else HISTORY_LIMIT
     )
 
+    # Replace the reservation with real usage (refunded on failure)
+    token_budget.settle(client_ip, reserved, result.get("tokens_used", 0))
+
     if not result["success"]:
         raise HTTPException(
             status_code=500,
@@ -110,9 +154,12 @@ async def chat(request: ChatRequest, req: Request):
 
 @router.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (liveness: healthy while the CV is still being ingested)"""
+    from ..main import ingestion
+
     return {
         "status": "healthy",
         "service": "FerBot",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "ingestion": ingestion.status
     }
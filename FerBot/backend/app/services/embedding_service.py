@@ -4,10 +4,44 @@ Creates and manages vector embeddings using OpenAI
 """
 
 import os
-from typing import List, Dict
+import json
+import random
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import List, Dict, Optional
 from openai import OpenAI
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+
+from .shared_index import SharedIndex
+from .token_budget import estimate_tokens
+
+# Corpus embedding: requests capped by estimated tokens and inputs (well under
+# the API's per-request limits), a few in flight at once, each retried alone
+BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "50000"))
+BATCH_MAX_INPUTS = 512
+BATCH_CONCURRENCY = int(os.getenv("EMBEDDING_BATCH_CONCURRENCY", "4"))
+BATCH_RETRIES = 3
+
+
+def plan_batches(texts: List[str], max_tokens: int = BATCH_TOKENS, max_inputs: int = BATCH_MAX_INPUTS) -> List[List[int]]:
+    """Group text indices, in order, into requests within the token and input caps"""
+    batches, current, tokens = [], [], 0
+    for i, text in enumerate(texts):
+        cost = estimate_tokens(text)
+        if current and (tokens + cost > max_tokens or len(current) >= max_inputs):
+            batches.append(current)
+            current, tokens = [], 0
+        current.append(i)
+        tokens += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def is_retryable(error: Exception) -> bool:
+    """Timeouts, connection errors, 429s and 5xx are worth retrying; other 4xx are not"""
+    status_code = getattr(error, "status_code", None)
+    return status_code is None or status_code == 429 or status_code >= 500
 
 
 class EmbeddingService:
@@ -16,7 +50,7 @@ class EmbeddingService:
     def __init__(self):
         self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.model = "text-embedding-3-small"  # Cost-effective, good quality
-        self.embeddings_cache: List[Dict] = []
+        self.index: Optional[SharedIndex] = None  # Memory-mapped, shared across workers
 
     async def create_embedding(self, text: str) -> List[float]:
         """
@@ -38,41 +72,89 @@ class EmbeddingService:
             print(f"Error creating embedding: {e}")
             return []
 
-    async def create_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+    def _checkpoint_key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\n{text}".encode()).hexdigest()[:24]
+
+    def _load_checkpoint(self, path: Optional[Path]) -> Dict[str, List[float]]:
+        vectors = {}
+        if path is None or not path.exists():
+            return vectors
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Truncated by an interruption
+                vectors[record["key"]] = record["embedding"]
+        return vectors
+
+    async def create_embeddings_batch(
+        self,
+        texts: List[str],
+        checkpoint_path: Optional[Path] = None
+    ) -> List[List[float]]:
         """
         Create embeddings for multiple texts
 
+        Texts go out in token-budgeted requests, BATCH_CONCURRENCY at a time,
+        each retried on its own with backoff. With a checkpoint, every
+        finished request is appended to it, so an interrupted build resumes
+        instead of starting over.
+
         Args:
             texts: List of texts to embed
+            checkpoint_path: NDJSON file of embeddings already created
 
         Returns:
-            List of embedding vectors
+            List of embedding vectors ([] if any request still fails)
         """
-        try:
-            response = self.client.embeddings.create(
-                model=self.model,
-                input=texts
-            )
-            return [item.embedding for item in response.data]
-        except Exception as e:
-            print(f"Error creating batch embeddings: {e}")
+        done = self._load_checkpoint(checkpoint_path)
+        embeddings = [done.get(self._checkpoint_key(text)) for text in texts]
+        pending = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if done:
+            print(f"[OK] Resuming embeddings: {len(texts) - len(pending)} from checkpoint")
+
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def embed(batch: List[int]):
+            indices = [pending[j] for j in batch]
+            inputs = [texts[i] for i in indices]
+            async with semaphore:
+                for attempt in range(BATCH_RETRIES + 1):
+                    try:
+                        response = await asyncio.to_thread(
+                            self.client.embeddings.create, model=self.model, input=inputs
+                        )
+                        break
+                    except Exception as e:
+                        if attempt == BATCH_RETRIES or not is_retryable(e):
+                            raise
+                        await asyncio.sleep(random.uniform(0.5, 1.0) * 2 ** attempt)
+
+            vectors = [item.embedding for item in response.data]
+            if len(vectors) != len(inputs):
+                raise RuntimeError(f"Got {len(vectors)} embeddings for {len(inputs)} inputs")
+            for i, vector in zip(indices, vectors):
+                embeddings[i] = vector
+
+            if checkpoint_path is not None:
+                with open(checkpoint_path, "a", encoding="utf-8") as f:
+                    f.writelines(
+                        json.dumps({"key": self._checkpoint_key(text), "embedding": vector}) + "\n"
+                        for text, vector in zip(inputs, vectors)
+                    )
+
+        batches = plan_batches([texts[i] for i in pending])
+        results = await asyncio.gather(*(embed(batch) for batch in batches), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            print(f"Error creating batch embeddings ({len(errors)} of {len(batches)} requests failed): {errors[0]}")
             return []
+        return embeddings
 
-    def cache_embeddings(self, chunks: List[Dict], embeddings: List[List[float]]):
-        """
-        Cache embeddings with their source chunks
-
-        Args:
-            chunks: List of text chunks
-            embeddings: Corresponding embeddings
-        """
-        self.embeddings_cache = [
-            {
-                "chunk": chunk,
-                "embedding": embedding
-            }
-            for chunk, embedding in zip(chunks, embeddings)
-        ]
+    def attach_index(self, index: SharedIndex):
+        """Search against a (shared, memory-mapped) index"""
+        self.index = index
 
     async def search_similar(self, query: str, top_k: int = 3) -> List[Dict]:
         """
@@ -85,7 +167,7 @@ class EmbeddingService:
         Returns:
             List of most similar chunks with scores
         """
-        if not self.embeddings_cache:
+        if self.index is None:
             return []
 
         # Create query embedding
@@ -93,20 +175,4 @@ class EmbeddingService:
         if not query_embedding:
             return []
 
-        # Calculate similarities
-        query_vec = np.array([query_embedding])
-        cache_vecs = np.array([item["embedding"] for item in self.embeddings_cache])
-
-        similarities = cosine_similarity(query_vec, cache_vecs)[0]
-
-        # Get top-k results
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
-
-        results = []
-        for idx in top_indices:
-            results.append({
-                "chunk": self.embeddings_cache[idx]["chunk"],
-                "similarity": float(similarities[idx])
-            })
-
-        return results
+        return self.index.search(query_embedding, top_k)
@@ -3,9 +3,26 @@ PDF Parser Service
 Extracts content from Fernando's CV PDF
 """
 
-import pymupdf4llm
+import os
+import asyncio
+import hashlib
+import multiprocessing
 from pathlib import Path
-from typing import Dict, List
+from importlib import metadata
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+# Bump when parse_cv's output changes for the same PDF (invalidates cached markdown)
+PARSER_FORMAT = 1
+
+
+def parser_version() -> str:
+    """Version of everything that shapes the markdown: this parser and pymupdf4llm"""
+    try:
+        library = metadata.version("pymupdf4llm")
+    except metadata.PackageNotFoundError:
+        library = "missing"
+    return f"{PARSER_FORMAT}-pymupdf4llm-{library}"
 
 
 class PDFParser:
@@ -23,6 +40,9 @@ class PDFParser:
             Dict with markdown content
         """
         try:
+            # Imported here: only needed at startup, and slow to import
+            import pymupdf4llm
+
             # Extract with PyMuPDF4LLM (preserves structure for LLMs)
             md_text = pymupdf4llm.to_markdown(pdf_path)
 
@@ -38,6 +58,52 @@ class PDFParser:
                 "content": ""
             }
 
+    @staticmethod
+    async def parse_cv_cached(pdf_path: str, cache_dir: Optional[Path] = None) -> Dict[str, str]:
+        """
+        parse_cv in a worker process, with the markdown cached on disk
+
+        The cache key is the PDF's content hash plus parser_version(), so an
+        unchanged CV is never parsed twice and the event loop is never blocked
+        by pymupdf4llm.
+
+        Args:
+            pdf_path: Path to PDF file
+            cache_dir: Directory for cached markdown (None disables the cache)
+
+        Returns:
+            Dict with markdown content (plus "cached": True on a cache hit)
+        """
+        try:
+            pdf_bytes = await asyncio.to_thread(Path(pdf_path).read_bytes)
+        except OSError as e:
+            return {"success": False, "error": str(e), "content": ""}
+
+        digest = hashlib.sha256(parser_version().encode() + b"\n" + pdf_bytes).hexdigest()[:24]
+        cache_path = cache_dir / f"{digest}.md" if cache_dir else None
+
+        if cache_path is not None and cache_path.exists():
+            content = await asyncio.to_thread(cache_path.read_text, encoding="utf-8")
+            return {"success": True, "content": content, "source": Path(pdf_path).name, "cached": True}
+
+        # spawn, not fork: the parent has an event loop and threads running
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                result = await asyncio.get_running_loop().run_in_executor(pool, PDFParser.parse_cv, pdf_path)
+        except Exception as e:
+            return {"success": False, "error": f"Parser process failed: {e}", "content": ""}
+
+        if result["success"] and cache_path is not None:
+            try:
+                cache_dir.mkdir(parents=True, exist_ok=True)
+                tmp_path = cache_path.with_suffix(f".tmp-{os.getpid()}")
+                tmp_path.write_text(result["content"], encoding="utf-8")
+                os.replace(tmp_path, cache_path)
+            except OSError as e:
+                print(f"[WARNING] Parsed CV not cached: {e}")
+
+        return result
+
     @staticmethod
     def chunk_content(content: str, chunk_size: int = 1000, overlap: int = 200) -> List[Dict[str, any]]:
         """
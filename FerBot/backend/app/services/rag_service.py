@@ -9,19 +9,9 @@ from openai import OpenAI
 from .embedding_service import EmbeddingService
 
 
-class RAGService:
-    """RAG system for Fernando's portfolio assistant"""
-
-    def __init__(self, embedding_service: EmbeddingService):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.embedding_service = embedding_service
-        self.model = "gpt-5-mini"
-
-    def get_system_prompt(self, language: str = "es") -> str:
-        """Get system prompt in specified language"""
-
-        prompts = {
-            "es": """Eres Fernando Prada, un AI Architect & Tech Lead. Respondes preguntas sobre tu experiencia, proyectos y habilidades.
+# System prompts per language (built once at import)
+SYSTEM_PROMPTS = {
+    "es": """Eres Fernando Prada, un AI Architect & Tech Lead. Respondes preguntas sobre tu experiencia, proyectos y habilidades.
 
 PERSONALIDAD:
 - Profesional pero cercano y conversacional
@@ -45,7 +35,7 @@ INSTRUCCIONES:
 
 TONO: Profesional, cercano, técnico cuando es necesario""",
 
-            "en": """You are Fernando Prada, an AI Architect & Tech Lead. You answer questions about your experience, projects, and skills.
+    "en": """You are Fernando Prada, an AI Architect & Tech Lead. You answer questions about your experience, projects, and skills.
 
 PERSONALITY:
 - Professional yet friendly and conversational
@@ -68,15 +58,28 @@ INSTRUCTIONS:
 6. DO NOT make up information not in the context
 
 TONE: Professional, friendly, technical when necessary"""
-        }
+}
 
-        return prompts.get(language, prompts["es"])
+
+class RAGService:
+    """RAG system for Fernando's portfolio assistant"""
+
+    def __init__(self, embedding_service: EmbeddingService):
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.embedding_service = embedding_service
+        self.model = "gpt-5-mini"
+
+    def get_system_prompt(self, language: str = "es") -> str:
+        """Get system prompt in specified language"""
+        return SYSTEM_PROMPTS.get(language, SYSTEM_PROMPTS["es"])
 
     async def generate_response(
         self,
         question: str,
         language: str = "es",
-        conversation_history: List[Dict] = None
+        conversation_history: List[Dict] = None,
+        max_tokens: int = 500,
+        history_limit: int = 6
     ) -> Dict:
         """
         Generate response using RAG
@@ -85,6 +88,8 @@ TONE: Professional, friendly, technical when necessary"""
             question: User's question
             language: Response language (es/en)
             conversation_history: Previous messages
+            max_tokens: Output token budget for the answer
+            history_limit: Number of previous messages to include
 
         Returns:
             Response with answer and sources
@@ -107,8 +112,8 @@ TONE: Professional, friendly, technical when necessary"""
         ]
 
         # Add conversation history if exists
-        if conversation_history:
-            messages.extend(conversation_history[-6:])  # Last 3 exchanges
+        if conversation_history and history_limit > 0:
+            messages.extend(conversation_history[-history_limit:])
 
         # Add current question with context
         user_message = f"""CONTEXTO RECUPERADO:
@@ -127,7 +132,7 @@ PREGUNTA DEL USUARIO:
                 model=self.model,
                 messages=messages,
                 temperature=0.7,
-                max_tokens=500
+                max_tokens=max_tokens
             )
 
             answer = response.choices[0].message.content
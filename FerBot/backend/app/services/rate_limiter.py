@@ -0,0 +1,423 @@
+"""
+Rate Limiter
+Sliding-window-counter rate limiting with a bounded, LRU-evicted key table,
+optionally backed by a shared store (Redis or SQLite) across instances
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+
+class SlidingWindowRateLimiter:
+    """
+    Approximate sliding window rate limiter.
+
+    Each key stores only [window_start, current_count, previous_count]. The
+    request count over the last `window_seconds` is estimated as the current
+    window's count plus the previous window's count weighted by how much of
+    it still overlaps, so every check is O(1) regardless of the limit.
+    At most `max_keys` clients are tracked; the least recently seen is evicted.
+    """
+
+    def __init__(self, limit: int, window_seconds: float, max_keys: int = 100_000):
+        self.limit = limit
+        self.window = float(window_seconds)
+        self.max_keys = max_keys
+        self.keys: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"allowed": 0, "rejected": 0, "evicted": 0}
+
+    def _entry(self, key: str, now: float) -> List[float]:
+        """Get the key's counters rolled forward to the window containing now"""
+        window_start = now - (now % self.window)
+        entry = self.keys.get(key)
+
+        if entry is None:
+            entry = [window_start, 0, 0]
+            self.keys[key] = entry
+            if len(self.keys) > self.max_keys:
+                self.keys.popitem(last=False)
+                self.stats["evicted"] += 1
+            return entry
+
+        self.keys.move_to_end(key)
+        if entry[0] != window_start:
+            # Previous count only survives if the windows are adjacent
+            adjacent = window_start - entry[0] <= self.window
+            entry[2] = entry[1] if adjacent else 0
+            entry[1] = 0
+            entry[0] = window_start
+        return entry
+
+    def _estimate(self, entry: List[float], now: float) -> float:
+        overlap = 1.0 - (now - entry[0]) / self.window
+        return entry[1] + entry[2] * overlap
+
+    def allow(self, key: str, now: Optional[float] = None) -> bool:
+        """Count a request for key and return False if it exceeds the limit"""
+        now = time.monotonic() if now is None else now
+
+        with self.lock:
+            entry = self._entry(key, now)
+            if self._estimate(entry, now) >= self.limit:
+                self.stats["rejected"] += 1
+                return False
+
+            entry[1] += 1
+            self.stats["allowed"] += 1
+            return True
+
+    def is_limited(self, key: str, now: Optional[float] = None) -> bool:
+        """Return True if the next request for key would be rejected, without counting it"""
+        now = time.monotonic() if now is None else now
+        window_start = now - (now % self.window)
+
+        with self.lock:
+            entry = self.keys.get(key)
+            if entry is None:
+                return False
+            if entry[0] == window_start:
+                current, previous = entry[1], entry[2]
+            elif window_start - entry[0] <= self.window:
+                current, previous = 0, entry[1]
+            else:
+                return False
+
+        overlap = 1.0 - (now - window_start) / self.window
+        return current + previous * overlap >= self.limit
+
+    def snapshot(self) -> Dict:
+        return {**self.stats, "tracked_keys": len(self.keys), "max_keys": self.max_keys}
+
+
+class RateLimitBackend(ABC):
+    """Shared counter store; incr must add and refresh expiry atomically"""
+
+    name = "base"
+
+    @abstractmethod
+    def incr(self, counts: Dict[str, int], ttl_seconds: float) -> Dict[str, int]:
+        """
+        Add counts to each key in one round trip
+
+        Args:
+            counts: Key -> amount to add (0 just reads the current total)
+            ttl_seconds: Expiry applied to every touched key
+
+        Returns:
+            Key -> total after the increment
+        """
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """Counters in Redis (or any Redis-protocol server), INCRBY + EXPIRE in one MULTI"""
+
+    name = "redis"
+
+    def __init__(self, url: str, timeout: float = 0.5):
+        import redis  # Optional dependency, only needed for this backend
+
+        self.client = redis.Redis.from_url(
+            url, socket_timeout=timeout, socket_connect_timeout=timeout
+        )
+
+    def incr(self, counts: Dict[str, int], ttl_seconds: float) -> Dict[str, int]:
+        keys = list(counts)
+        pipe = self.client.pipeline(transaction=True)
+        for key in keys:
+            pipe.incrby(key, counts[key])
+            pipe.expire(key, int(ttl_seconds) + 1)
+        results = pipe.execute()
+        return dict(zip(keys, results[0::2]))
+
+
+class SQLiteRateLimitBackend(RateLimitBackend):
+    """Counters in a local SQLite file (or :memory:), shared by processes on one host"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = ":memory:", timeout: float = 1.0):
+        self.conn = sqlite3.connect(
+            path, timeout=timeout, isolation_level=None, check_same_thread=False
+        )
+        self.lock = threading.Lock()
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits ("
+            "key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS rate_limits_expiry ON rate_limits (expires_at)"
+        )
+
+    def incr(self, counts: Dict[str, int], ttl_seconds: float) -> Dict[str, int]:
+        now = time.time()
+        totals = {}
+
+        with self.lock:
+            # IMMEDIATE takes the write lock up front so concurrent writers serialize
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("DELETE FROM rate_limits WHERE expires_at < ?", (now,))
+                for key, amount in counts.items():
+                    self.conn.execute(
+                        "INSERT INTO rate_limits (key, count, expires_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET "
+                        "count = count + excluded.count, expires_at = excluded.expires_at",
+                        (key, amount, now + ttl_seconds)
+                    )
+                    row = self.conn.execute(
+                        "SELECT count FROM rate_limits WHERE key = ?", (key,)
+                    ).fetchone()
+                    totals[key] = row[0]
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+        return totals
+
+
+class SharedRateLimiter:
+    """
+    Sliding-window-counter limiter whose counters live in a shared backend.
+
+    Requests are counted locally and flushed in one backend call every
+    `sync_interval` seconds or `batch_size` requests, whichever comes first.
+    Flushes run on a single background thread, outside the lock, so allow()
+    never waits on the network (it is called from the event loop). Decisions
+    use the last totals read from the backend plus local counts not yet
+    reflected in them, so one instance can overshoot by about a batch.
+    On backend errors the limiter fails open to a local
+    SlidingWindowRateLimiter for `retry_after` seconds.
+    """
+
+    def __init__(
+        self,
+        backend: RateLimitBackend,
+        limit: int,
+        window_seconds: float,
+        max_keys: int = 100_000,
+        sync_interval: float = 1.0,
+        batch_size: int = 20,
+        retry_after: float = 30.0,
+        prefix: str = "ferbot:rl"
+    ):
+        self.backend = backend
+        self.limit = limit
+        self.window = float(window_seconds)
+        self.max_keys = max_keys
+        self.sync_interval = sync_interval
+        self.batch_size = batch_size
+        self.retry_after = retry_after
+        self.prefix = prefix
+
+        # client -> [window_index, current_total, previous_total] as last read from the backend
+        self.remote: "OrderedDict[str, List[int]]" = OrderedDict()
+        # (client, window_index) -> requests not yet flushed
+        self.pending: Dict[Tuple[str, int], int] = {}
+        self.pending_total = 0
+        # (client, window_index) -> requests sent by the flush in progress
+        self.inflight: Dict[Tuple[str, int], int] = {}
+        self.flushing = False
+        self.last_flush = 0.0
+        self.backend_down_until = 0.0
+
+        self.fallback = SlidingWindowRateLimiter(limit, window_seconds, max_keys=max_keys)
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rate-limit-flush")
+        self.stats = {
+            "allowed": 0, "rejected": 0, "flushes": 0,
+            "backend_errors": 0, "fallback_decisions": 0
+        }
+
+    def _backend_key(self, client: str, window_index: int) -> str:
+        return f"{self.prefix}:{client}:{window_index}"
+
+    def _remote_entry(self, client: str, window_index: int) -> List[int]:
+        """Get the client's last known totals rolled forward to window_index"""
+        entry = self.remote.get(client)
+
+        if entry is None:
+            entry = [window_index, 0, 0]
+            self.remote[client] = entry
+            if len(self.remote) > self.max_keys:
+                self.remote.popitem(last=False)
+            return entry
+
+        self.remote.move_to_end(client)
+        if entry[0] != window_index:
+            entry[2] = entry[1] if entry[0] == window_index - 1 else 0
+            entry[1] = 0
+            entry[0] = window_index
+        return entry
+
+    def _unsynced(self, client: str, window_index: int) -> int:
+        """Local requests not yet reflected in the remote totals"""
+        key = (client, window_index)
+        return self.pending.get(key, 0) + self.inflight.get(key, 0)
+
+    def _start_flush(self, client: str, window_index: int, now: float):
+        """Hand pending counts to the flush thread (called with the lock held)"""
+        counts = {
+            self._backend_key(c, idx): n for (c, idx), n in self.pending.items()
+        }
+        owners = {self._backend_key(c, idx): (c, idx) for (c, idx) in self.pending}
+        # Also refresh the current client's totals in the same call
+        for idx in (window_index, window_index - 1):
+            key = self._backend_key(client, idx)
+            counts.setdefault(key, 0)
+            owners[key] = (client, idx)
+
+        self.inflight, self.pending = self.pending, {}
+        self.pending_total = 0
+        self.last_flush = now
+        self.flushing = True
+        self.executor.submit(self._flush, counts, owners, client, window_index)
+
+    def _flush(
+        self,
+        counts: Dict[str, int],
+        owners: Dict[str, Tuple[str, int]],
+        client: str,
+        window_index: int
+    ):
+        """Send counts in one backend call (flush thread), then merge the totals"""
+        try:
+            totals = self.backend.incr(counts, ttl_seconds=2 * self.window)
+        except Exception as e:
+            print(f"[WARNING] Rate limit backend unavailable, using local limiter: {e}")
+            with self.lock:
+                self.stats["backend_errors"] += 1
+                self.backend_down_until = time.time() + self.retry_after
+                self.inflight = {}
+                self.pending.clear()
+                self.pending_total = 0
+                self.flushing = False
+            return
+
+        with self.lock:
+            # The totals include the in-flight counts, so those are now remote
+            self.inflight = {}
+            self.flushing = False
+            self.stats["flushes"] += 1
+
+            for key, total in totals.items():
+                owner, idx = owners[key]
+                entry = self.remote.get(owner)
+                if entry is None and owner == client:
+                    entry = self._remote_entry(client, window_index)
+                if entry is None:
+                    continue
+                if idx == entry[0]:
+                    entry[1] = int(total)
+                elif idx == entry[0] - 1:
+                    entry[2] = int(total)
+
+            # A full batch built up while this flush was in flight: send it now
+            if self.pending_total >= self.batch_size:
+                now = time.time()
+                self._start_flush(client, int(now // self.window), now)
+
+    def allow(self, key: str, now: Optional[float] = None) -> bool:
+        """Count a request for key and return False if it exceeds the limit"""
+        # Window boundaries must agree across instances, so use wall-clock time
+        now = time.time() if now is None else now
+
+        with self.lock:
+            if now < self.backend_down_until:
+                self.stats["fallback_decisions"] += 1
+                return self.fallback.allow(key)
+
+            window_index = int(now // self.window)
+
+            if not self.flushing and (
+                self.pending_total >= self.batch_size or now - self.last_flush >= self.sync_interval
+            ):
+                self._start_flush(key, window_index, now)
+
+            entry = self._remote_entry(key, window_index)
+            current = entry[1] + self._unsynced(key, window_index)
+            previous = entry[2] + self._unsynced(key, window_index - 1)
+            overlap = 1.0 - (now - window_index * self.window) / self.window
+
+            if current + previous * overlap >= self.limit:
+                self.stats["rejected"] += 1
+                return False
+
+            self.pending[(key, window_index)] = self.pending.get((key, window_index), 0) + 1
+            self.pending_total += 1
+            self.stats["allowed"] += 1
+            return True
+
+    def is_limited(self, key: str, now: Optional[float] = None) -> bool:
+        """Return True if the next request for key would be rejected (local state only)"""
+        now = time.time() if now is None else now
+
+        with self.lock:
+            if now < self.backend_down_until:
+                return self.fallback.is_limited(key)
+
+            entry = self.remote.get(key)
+            window_index = int(now // self.window)
+            current = self._unsynced(key, window_index)
+            previous = self._unsynced(key, window_index - 1)
+            if entry is not None and entry[0] == window_index:
+                current += entry[1]
+                previous += entry[2]
+            elif entry is not None and entry[0] == window_index - 1:
+                previous += entry[1]
+
+        overlap = 1.0 - (now - window_index * self.window) / self.window
+        return current + previous * overlap >= self.limit
+
+    def snapshot(self) -> Dict:
+        return {
+            **self.stats,
+            "backend": self.backend.name,
+            "backend_healthy": time.time() >= self.backend_down_until,
+            "pending": self.pending_total,
+            "flushing": self.flushing,
+            "tracked_keys": len(self.remote),
+            "fallback": self.fallback.snapshot()
+        }
+
+
+def create_rate_limiter(limit: int, window_seconds: float, max_keys: int = 100_000):
+    """
+    Build the rate limiter selected by RATE_LIMIT_BACKEND (memory, redis, sqlite)
+
+    Falls back to the in-memory limiter if the shared backend cannot be created.
+    """
+    backend_name = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if backend_name == "memory":
+        return SlidingWindowRateLimiter(limit, window_seconds, max_keys=max_keys)
+
+    try:
+        if backend_name == "redis":
+            backend = RedisRateLimitBackend(
+                os.getenv("RATE_LIMIT_REDIS_URL") or os.getenv("REDIS_URL", "redis://localhost:6379/0")
+            )
+        elif backend_name == "sqlite":
+            backend = SQLiteRateLimitBackend(os.getenv("RATE_LIMIT_SQLITE_PATH", ":memory:"))
+        else:
+            raise ValueError(f"Unknown RATE_LIMIT_BACKEND '{backend_name}'")
+    except Exception as e:
+        print(f"[WARNING] Rate limit backend '{backend_name}' unavailable, using in-memory: {e}")
+        return SlidingWindowRateLimiter(limit, window_seconds, max_keys=max_keys)
+
+    return SharedRateLimiter(
+        backend,
+        limit,
+        window_seconds,
+        max_keys=max_keys,
+        sync_interval=float(os.getenv("RATE_LIMIT_SYNC_INTERVAL", "1.0")),
+        batch_size=int(os.getenv("RATE_LIMIT_BATCH_SIZE", "20"))
+    )
@@ -0,0 +1,204 @@
+"""
+Shared Index
+Memory-mapped vector matrix and chunk table shared by every worker on a host
+"""
+
+import os
+import json
+import mmap
+import shutil
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, run a single worker
+    fcntl = None
+
+INDEX_FORMAT = 1
+
+
+def index_version(source: Path, **params) -> str:
+    """Content hash of the source document plus everything that shapes the index"""
+    digest = hashlib.sha256(json.dumps({"format": INDEX_FORMAT, **params}, sort_keys=True).encode())
+    digest.update(source.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+class SharedIndex:
+    """
+    Read-only index attached from disk.
+
+    Layout of an index directory:
+        vectors.npy   float32 (n_chunks, dim), rows L2-normalized
+        chunks.jsonl  one JSON chunk per line
+        offsets.npy   int64 (n_chunks + 1) byte offsets into chunks.jsonl
+        meta.json     version, chunk count, source and embedding model
+
+    Vectors and chunks are memory-mapped, not loaded: every worker maps the
+    same files, so the OS page cache holds one copy per host, and a chunk is
+    only decoded when a search returns it.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        self.version = self.meta["version"]
+        self.matrix = np.load(path / "vectors.npy", mmap_mode="r")
+        self.offsets = np.load(path / "offsets.npy", mmap_mode="r")
+        with open(path / "chunks.jsonl", "rb") as f:
+            self.chunk_table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def chunk(self, idx: int) -> Dict:
+        return json.loads(self.chunk_table[self.offsets[idx]:self.offsets[idx + 1]])
+
+    def search(self, query_embedding: List[float], top_k: int = 3) -> List[Dict]:
+        """Top-k chunks by cosine similarity (one matrix-vector product over the mapping)"""
+        query_vec = np.asarray(query_embedding, dtype=np.float32)
+        similarities = self.matrix @ (query_vec / np.linalg.norm(query_vec))
+
+        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        return [
+            {
+                "chunk": self.chunk(idx),
+                "similarity": float(similarities[idx])
+            }
+            for idx in top_indices
+        ]
+
+    @staticmethod
+    def write(path: Path, chunks: List[Dict], embeddings: List[List[float]], meta: Dict):
+        """Write an index directory atomically (built under a temporary name, then renamed)"""
+        if not chunks or len(chunks) != len(embeddings):
+            raise ValueError(f"Cannot index {len(embeddings)} embeddings for {len(chunks)} chunks")
+
+        tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+
+        matrix = np.array(embeddings, dtype=np.float32)
+        np.save(tmp_path / "vectors.npy", matrix / np.linalg.norm(matrix, axis=1, keepdims=True))
+
+        offsets = [0]
+        with open(tmp_path / "chunks.jsonl", "wb") as f:
+            for chunk in chunks:
+                line = json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n"
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+        np.save(tmp_path / "offsets.npy", np.array(offsets, dtype=np.int64))
+
+        (tmp_path / "meta.json").write_text(
+            json.dumps({**meta, "chunks": len(chunks), "dim": int(matrix.shape[1])}, indent=2),
+            encoding="utf-8"
+        )
+        os.replace(tmp_path, path)
+
+
+async def load_or_build(
+    index_dir: Path,
+    version: str,
+    build: Callable[[], Awaitable[Tuple[List[Dict], List[List[float]]]]],
+    meta: Optional[Dict] = None
+) -> Tuple[SharedIndex, bool]:
+    """
+    Attach to index `version`, building it first if no worker has yet
+
+    The first worker to take the lock runs build() (parse, chunk, embed);
+    the others wait for it and attach to the result, so a host ingests once
+    however many workers it starts.
+
+    Returns:
+        (index, True if this process built it)
+    """
+    target = index_dir / version
+    if (target / "meta.json").exists():
+        return SharedIndex(target), False
+
+    index_dir.mkdir(parents=True, exist_ok=True)
+    built = False
+    with open(index_dir / ".lock", "w") as lock:
+        if fcntl is not None:
+            # Waiting for another worker's build must not block this event loop
+            await asyncio.to_thread(fcntl.flock, lock, fcntl.LOCK_EX)
+        try:
+            if not (target / "meta.json").exists():
+                chunks, embeddings = await build()
+                SharedIndex.write(target, chunks, embeddings, {**(meta or {}), "version": version})
+                built = True
+
+                # Older versions: workers still mapping them keep their pages until exit
+                for old in index_dir.iterdir():
+                    if old.name != version and (old / "meta.json").exists():
+                        shutil.rmtree(old, ignore_errors=True)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    return SharedIndex(target), built
+
+
+# Per-worker memory: each worker registers its pid next to the index, and any
+# worker can then report resident memory for all of them from /proc
+def register_worker(index_dir: Path):
+    workers = index_dir / "workers"
+    workers.mkdir(parents=True, exist_ok=True)
+    (workers / str(os.getpid())).touch()
+
+
+def unregister_worker(index_dir: Path):
+    try:
+        (index_dir / "workers" / str(os.getpid())).unlink()
+    except OSError:
+        pass
+
+
+def process_memory(pid: int) -> Optional[Dict]:
+    """Resident memory of a process in MB, split into private and shared (Linux)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return None
+
+    def mb(name: str) -> float:
+        return round(int(fields.get(name, "0 kB").split()[0]) / 1024, 1)
+
+    return {
+        "pid": pid,
+        "rss_mb": mb("VmRSS"),
+        "private_mb": mb("RssAnon"),
+        "shared_mb": round(mb("RssFile") + mb("RssShmem"), 1)
+    }
+
+
+def worker_memory(index_dir: Path) -> Dict:
+    """Resident memory of every registered worker (stale registrations are dropped)"""
+    workers = []
+    registry = index_dir / "workers"
+    for entry in sorted(registry.iterdir()) if registry.is_dir() else []:
+        usage = process_memory(int(entry.name)) if entry.name.isdigit() else None
+        if usage is None:
+            entry.unlink(missing_ok=True)
+        else:
+            workers.append(usage)
+
+    if not workers:
+        # No /proc (macOS, Windows): peak RSS of this process only, where available
+        try:
+            import resource
+        except ImportError:
+            return {"pid": os.getpid()}
+        return {"pid": os.getpid(), "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+    return {
+        "pid": os.getpid(),
+        "workers": workers,
+        "total_rss_mb": round(sum(worker["rss_mb"] for worker in workers), 1)
+    }
@@ -0,0 +1,125 @@
+"""
+Token Budget
+Per-client and global token quotas that complement request-count rate limits
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough token count (~4 characters per token) for pre-checks before generation"""
+    return sum(len(text) for text in texts if text) // 4 + 1
+
+
+class TokenBudget:
+    """
+    Token buckets per client and for the whole service.
+
+    Each client bucket refills `client_tokens` per window and the global
+    bucket refills `global_tokens` per window. reserve() pre-checks an
+    estimate before generation and holds it; settle() replaces the estimate
+    with the usage the API actually reported. Buckets may go negative, so
+    clients whose real usage overshoots their estimate wait longer to refill.
+    At most `max_keys` clients are tracked; the least recently seen is evicted.
+    """
+
+    def __init__(
+        self,
+        client_tokens: int,
+        global_tokens: int,
+        window_seconds: float,
+        max_keys: int = 100_000
+    ):
+        self.client_capacity = float(client_tokens)
+        self.global_capacity = float(global_tokens)
+        self.client_rate = client_tokens / window_seconds
+        self.global_rate = global_tokens / window_seconds
+        self.max_keys = max_keys
+
+        # bucket = [tokens_available, last_refill]
+        self.buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.global_bucket = [self.global_capacity, time.monotonic()]
+        self.lock = threading.Lock()
+        self.stats = {
+            "full": 0, "downgraded": 0, "rejected": 0,
+            "reserved_tokens": 0, "used_tokens": 0
+        }
+
+    @staticmethod
+    def _refill(bucket: List[float], capacity: float, rate: float, now: float):
+        bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+
+    def _client_bucket(self, client: str, now: float) -> List[float]:
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = [self.client_capacity, now]
+            self.buckets[client] = bucket
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(client)
+            self._refill(bucket, self.client_capacity, self.client_rate, now)
+        return bucket
+
+    def reserve(
+        self,
+        client: str,
+        estimate: int,
+        reduced_estimate: int = 0,
+        now: Optional[float] = None
+    ) -> int:
+        """
+        Hold tokens for a request before generation
+
+        Args:
+            client: Client key (IP)
+            estimate: Tokens the full request is expected to use
+            reduced_estimate: Tokens a downgraded request would use (0 = no downgrade)
+
+        Returns:
+            Tokens reserved: estimate, reduced_estimate if only the downgrade
+            fits, or 0 if the request must be rejected
+        """
+        now = time.monotonic() if now is None else now
+
+        with self.lock:
+            bucket = self._client_bucket(client, now)
+            self._refill(self.global_bucket, self.global_capacity, self.global_rate, now)
+            available = min(bucket[0], self.global_bucket[0])
+
+            if available >= estimate:
+                reserved, outcome = estimate, "full"
+            elif reduced_estimate and available >= reduced_estimate:
+                reserved, outcome = reduced_estimate, "downgraded"
+            else:
+                self.stats["rejected"] += 1
+                return 0
+
+            bucket[0] -= reserved
+            self.global_bucket[0] -= reserved
+            self.stats[outcome] += 1
+            self.stats["reserved_tokens"] += reserved
+            return reserved
+
+    def settle(self, client: str, reserved: int, actual: int, now: Optional[float] = None):
+        """Debit actual usage in place of the reservation (actual=0 refunds it)"""
+        now = time.monotonic() if now is None else now
+        difference = actual - reserved
+
+        with self.lock:
+            bucket = self._client_bucket(client, now)
+            bucket[0] -= difference
+            self.global_bucket[0] -= difference
+            self.stats["used_tokens"] += actual
+
+    def snapshot(self) -> Dict:
+        return {
+            **self.stats,
+            "global_available": int(self.global_bucket[0]),
+            "global_capacity": int(self.global_capacity),
+            "tracked_keys": len(self.buckets)
+        }
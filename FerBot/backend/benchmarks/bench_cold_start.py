@@ -0,0 +1,121 @@
+"""
+Cold-start benchmark
+Import time and time-to-first-response per module, each sample taken in a
+fresh interpreter so runs are reproducible. First responses use endpoints
+that need no API keys.
+
+Usage (from FerBot/backend):
+    python benchmarks/bench_cold_start.py
+    python benchmarks/bench_cold_start.py --repeats 10 --only portfolio.index
+"""
+
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+PORTFOLIO_API_DIR = Path(__file__).resolve().parents[3] / "portfolio" / "api"
+
+# name -> (sys.path entry, module, GET path for the first response or None)
+TARGETS = {
+    # Third-party dependencies on their own, for reference
+    "openai": (None, "openai", None),
+    "groq": (None, "groq", None),
+    "numpy": (None, "numpy", None),
+    "fastapi": (None, "fastapi", None),
+    "pydantic": (None, "pydantic", None),
+    "sklearn": (None, "sklearn.metrics.pairwise", None),
+    "pymupdf4llm": (None, "pymupdf4llm", None),
+    # FerBot backend
+    "ferbot.pdf_parser": (BACKEND_DIR, "app.services.pdf_parser", None),
+    "ferbot.embedding_service": (BACKEND_DIR, "app.services.embedding_service", None),
+    "ferbot.rag_service": (BACKEND_DIR, "app.services.rag_service", None),
+    "ferbot.main": (BACKEND_DIR, "app.main", "/"),
+    # Vercel serverless function
+    "portfolio.index": (PORTFOLIO_API_DIR, "index", "/api/ferbot/faq"),
+}
+
+CHILD = """
+import sys, time, json, importlib
+start = time.perf_counter()
+if {path!r}:
+    sys.path.insert(0, {path!r})
+module = importlib.import_module({module!r})
+imported = time.perf_counter()
+result = {{"import_ms": (imported - start) * 1000}}
+if {request!r}:
+    from fastapi.testclient import TestClient  # harness import, excluded below
+    harness = time.perf_counter() - imported
+    status = TestClient(module.app).get({request!r}).status_code
+    result["first_response_ms"] = (time.perf_counter() - start - harness) * 1000
+    result["status"] = status
+print(json.dumps(result))
+"""
+
+
+def sample(path, module: str, request) -> dict:
+    """One measurement in a fresh interpreter"""
+    code = CHILD.format(path=str(path) if path else "", module=module, request=request)
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True, text=True, cwd=str(path or BACKEND_DIR)
+    )
+    if proc.returncode != 0:
+        error = proc.stderr.strip().splitlines()
+        return {"error": error[-1] if error else f"exit {proc.returncode}"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def measure(name: str, repeats: int) -> dict:
+    path, module, request = TARGETS[name]
+    sample(path, module, request)  # Warm-up: writes .pyc files and fills the OS page cache
+
+    samples = [sample(path, module, request) for _ in range(repeats)]
+    errors = [s["error"] for s in samples if "error" in s]
+    if errors:
+        return {"error": errors[0]}
+
+    result = {
+        "import_ms": statistics.median(s["import_ms"] for s in samples),
+        "import_min_ms": min(s["import_ms"] for s in samples),
+    }
+    if request:
+        result["first_response_ms"] = statistics.median(s["first_response_ms"] for s in samples)
+        result["status"] = samples[-1]["status"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5, help="fresh interpreters per target")
+    parser.add_argument("--only", nargs="*", choices=list(TARGETS), help="targets to measure")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = {name: measure(name, args.repeats) for name in args.only or TARGETS}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"Python {sys.version.split()[0]}, median of {args.repeats} fresh interpreters")
+    print(f"  {'target':26s} {'import':>10s} {'(min)':>10s} {'first response':>16s}")
+    for name, result in results.items():
+        if "error" in result:
+            print(f"  {name:26s} {'skipped':>10s}  {result['error'][:60]}")
+            continue
+        first = (
+            f"{result['first_response_ms']:>11,.0f} ms ({result['status']})"
+            if "first_response_ms" in result else ""
+        )
+        print(
+            f"  {name:26s} {result['import_ms']:>7,.0f} ms "
+            f"{result['import_min_ms']:>7,.0f} ms {first}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Rate limiter benchmark
+Compares the sliding-window-counter limiter with the old list-per-IP limiter
+at millions of distinct client IPs.
+
+Usage (from FerBot/backend):
+    python benchmarks/bench_rate_limiter.py --ips 2000000
+    python benchmarks/bench_rate_limiter.py --ips 2000000 --legacy
+"""
+
+import sys
+import time
+import argparse
+import tracemalloc
+from pathlib import Path
+from datetime import datetime, timedelta
+from collections import defaultdict
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.rate_limiter import SlidingWindowRateLimiter  # noqa: E402
+
+RATE_LIMIT = 10
+RATE_WINDOW = timedelta(minutes=5)
+
+
+class LegacyRateLimiter:
+    """The original list-of-datetimes limiter, kept here as the baseline"""
+
+    def __init__(self):
+        self.store = defaultdict(list)
+
+    def allow(self, client_ip: str) -> bool:
+        now = datetime.now()
+        self.store[client_ip] = [
+            timestamp for timestamp in self.store[client_ip]
+            if now - timestamp < RATE_WINDOW
+        ]
+        if len(self.store[client_ip]) >= RATE_LIMIT:
+            return False
+        self.store[client_ip].append(now)
+        return True
+
+
+def ip_for(i: int) -> str:
+    return f"{(i >> 24) & 255}.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+
+
+def run(make_limiter, n_ips: int, repeats: int) -> dict:
+    """Every IP calls `repeats` times; timed untraced, then replayed under tracemalloc"""
+    ips = [ip_for(i) for i in range(n_ips)]
+
+    limiter = make_limiter()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for ip in ips:
+            limiter.allow(ip)
+    elapsed = time.perf_counter() - start
+
+    traced = make_limiter()
+    tracemalloc.start()
+    for _ in range(repeats):
+        for ip in ips:
+            traced.allow(ip)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    calls = n_ips * repeats
+    return {
+        "limiter": limiter,
+        "ops_per_sec": calls / elapsed,
+        "ns_per_call": elapsed / calls * 1e9,
+        "memory_mb": current / 1024 / 1024,
+        "peak_mb": peak / 1024 / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ips", type=int, default=2_000_000, help="distinct client IPs")
+    parser.add_argument("--repeats", type=int, default=2, help="calls per IP")
+    parser.add_argument("--max-keys", type=int, default=100_000, help="tracked key cap")
+    parser.add_argument("--legacy", action="store_true", help="also run the list-based limiter")
+    args = parser.parse_args()
+
+    limiters = {
+        "sliding_window": lambda: SlidingWindowRateLimiter(
+            RATE_LIMIT, RATE_WINDOW.total_seconds(), max_keys=args.max_keys
+        )
+    }
+    if args.legacy:
+        limiters["legacy_list"] = LegacyRateLimiter
+
+    print(f"{args.ips:,} distinct IPs x {args.repeats} calls")
+    for name, make_limiter in limiters.items():
+        result = run(make_limiter, args.ips, args.repeats)
+        print(
+            f"  {name:15s} {result['ops_per_sec']:>12,.0f} ops/s "
+            f"{result['ns_per_call']:>8,.0f} ns/call "
+            f"mem {result['memory_mb']:>8,.1f} MB (peak {result['peak_mb']:,.1f} MB)"
+        )
+        if name == "sliding_window":
+            print(f"  {'':15s} {result['limiter'].snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Pre-generate FerBot FAQ answers
+Run at build/deploy time, after preprocess_cv.py, to (re)generate and moderate
+answers for data/faq_questions.json into data/faq_answers.json
+"""
+import asyncio
+import argparse
+
+from index import faq_store
+
+
+def main():
+    """Build the FAQ answer store"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--force", action="store_true", help="regenerate fresh answers too")
+    args = parser.parse_args()
+
+    summary = asyncio.run(faq_store.build(force=args.force))
+
+    print(f"✓ FAQ answers: {summary['generated']} generated, {summary['failed']} failed")
+    print(f"  Questions: {summary['questions']}")
+    print(f"  Index version: {summary['index_version']}")
+    print(f"  Generator version: {summary['generator_version']}")
+    print(f"  Output: {faq_store.answers_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Bulk-ingest PDFs and markdown files into one FerBot corpus
+Extracts every document in a process pool, streams sections as NDJSON and
+writes a cv_data.json-compatible corpus (data/corpus.json by default; point
+INDEX_SOURCE_PATH at it). Each section is labelled with its document's name.
+Identical files (same content hash) are extracted once.
+
+Usage (from portfolio/):
+    python api/ingest_corpus.py ../CV "../README Proyectos"
+    python api/ingest_corpus.py "docs/**/*.md" --ndjson - --output /tmp/corpus.json
+"""
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Dict, List
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from preprocess_cv import DATA_DIR, extract_pages, split_sections
+
+EXTENSIONS = {".pdf", ".md", ".markdown"}
+CORPUS_PATH = DATA_DIR / "corpus.json"  # Separate from cv_data.json, which preprocess_cv.py owns
+
+
+def collect_documents(patterns: List[str]) -> List[Path]:
+    """Files matching each directory (recursive), glob pattern or path"""
+    paths = set()
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            matches = [p for p in path.rglob("*") if p.suffix.lower() in EXTENSIONS]
+        elif glob.has_magic(pattern):
+            matches = [Path(p) for p in glob.glob(pattern, recursive=True)]
+        else:
+            matches = [path]
+        paths.update(p.resolve() for p in matches if p.is_file() and p.suffix.lower() in EXTENSIONS)
+    return sorted(paths)
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def extract_document(path: Path) -> Dict:
+    """Sections of one document, per page for PDFs (runs in a worker process)"""
+    if path.suffix.lower() == ".pdf":
+        pages = [record for record, _ in extract_pages(path, {})]
+    else:
+        md_text = path.read_text(encoding="utf-8")
+        pages = [{"page": 0, "markdown": md_text, "sections": split_sections(md_text)}]
+
+    return {
+        "markdown": "".join(page["markdown"] for page in pages),
+        "sections": [
+            {"page": page["page"], "text": section}
+            for page in pages for section in page["sections"]
+        ]
+    }
+
+
+def main():
+    """Bulk ingestion pipeline"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="directories, glob patterns or files")
+    parser.add_argument("--output", type=Path, default=CORPUS_PATH, help="corpus JSON to write")
+    parser.add_argument("--ndjson", help="stream sections as NDJSON to this file ('-' for stdout)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="extraction processes")
+    args = parser.parse_args()
+
+    # Progress goes to stderr when NDJSON streams to stdout
+    log = sys.stderr if args.ndjson == "-" else sys.stdout
+    start = time.perf_counter()
+
+    # Deduplicate by content hash before extracting anything
+    documents: Dict[str, List[Path]] = {}
+    for path in collect_documents(args.inputs):
+        documents.setdefault(file_hash(path), []).append(path)
+    files = sum(len(paths) for paths in documents.values())
+    print(f"Ingesting {len(documents)} documents ({files - len(documents)} duplicates skipped) "
+          f"with {args.workers} workers...", file=log)
+
+    stream = None
+    if args.ndjson == "-":
+        stream = sys.stdout
+    elif args.ndjson:
+        stream = open(args.ndjson, "w", encoding="utf-8")
+
+    results = {}
+    failed = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = {
+                pool.submit(extract_document, paths[0]): digest
+                for digest, paths in documents.items()
+            }
+            for future in as_completed(futures):
+                digest = futures[future]
+                source = documents[digest][0]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"  ✗ {source.name}: {e}", file=log)
+                    failed += 1
+                    continue
+
+                results[digest] = result
+                print(f"  {source.name}: {len(result['sections'])} sections", file=log)
+                if stream is not None:
+                    for i, section in enumerate(result["sections"]):
+                        stream.write(json.dumps({
+                            "document": source.name, "hash": digest, "section": i, **section
+                        }, ensure_ascii=False) + "\n")
+                    stream.flush()
+    finally:
+        if stream is not None and stream is not sys.stdout:
+            stream.close()
+
+    elapsed = time.perf_counter() - start
+
+    # One corpus, in a stable order (by path) whatever order workers finished in.
+    # Sections stay plain strings (cv_data.json format), labelled with their
+    # document so retrieved chunks say which project or file they come from
+    ordered = sorted(results, key=lambda digest: documents[digest][0])
+    sections = [
+        f"[{documents[digest][0].stem}]\n{section['text']}"
+        for digest in ordered for section in results[digest]["sections"]
+    ]
+    full_text = "\n\n".join(results[digest]["markdown"] for digest in ordered)
+    corpus = {
+        "full_text": full_text,
+        "sections": sections,
+        "metadata": {
+            "source": ", ".join(documents[digest][0].name for digest in ordered),
+            "total_sections": len(sections),
+            "characters": len(full_text),
+            "documents": [
+                {
+                    "path": documents[digest][0].name,
+                    "hash": digest,
+                    "sections": len(results[digest]["sections"]),
+                    "duplicates": len(documents[digest]) - 1
+                }
+                for digest in ordered
+            ]
+        }
+    }
+
+    print(f"Ingested {len(results)} documents, {len(sections)} sections, {failed} failed", file=log)
+    print(f"  {elapsed:.2f}s, {len(results) / elapsed:.1f} docs/s", file=log)
+
+    if not results:
+        print("✗ Nothing ingested, corpus not written", file=log)
+        sys.exit(1)
+
+    tmp_path = args.output.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(corpus, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, args.output)
+    print(f"✓ Corpus: {args.output}", file=log)
+
+
+if __name__ == "__main__":
+    main()
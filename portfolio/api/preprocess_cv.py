@@ -1,58 +1,171 @@
 """
 Extract CV data from PDF to JSON using PyMuPDF4LLM
-Run this script once to generate cv_data.json
+Run this script after changing the PDF to (re)generate cv_data.json
+
+Extraction is incremental, page by page: each page is keyed by a hash of its
+content stream, links and resources, and pages whose hash is already in cv_pages.ndjson are reused
+instead of re-extracted, so a re-run costs what the edit changed.
 """
+import os
 import json
+import time
+import hashlib
+import argparse
 from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+import pymupdf
 import pymupdf4llm
 
 # Setup
 DATA_DIR = Path(__file__).parent / "data"
 CV_PATH = DATA_DIR / "CV_LinkedIn.pdf"
 OUTPUT_PATH = DATA_DIR / "cv_data.json"
+PAGES_PATH = DATA_DIR / "cv_pages.ndjson"  # Per-page extraction store, one JSON record per line
 
-def extract_cv_to_json(pdf_path: Path) -> dict:
-    """Extract CV from PDF to structured JSON"""
-    print(f"Extracting CV from {pdf_path}...")
+# Bump when the page -> sections logic or page_hash changes (invalidates every stored page)
+EXTRACTOR_VERSION = f"2-pymupdf4llm-{pymupdf4llm.__version__}"
 
-    # Extract as markdown
-    md_text = pymupdf4llm.to_markdown(str(pdf_path))
 
-    # Split into sections (simple paragraph-based splitting)
+def split_sections(md_text: str) -> List[str]:
+    """Split into sections (simple paragraph-based splitting)"""
     sections = []
     for paragraph in md_text.split('\n\n'):
         paragraph = paragraph.strip()
         if paragraph:
             sections.append(paragraph)
+    return sections
+
+
+def page_hash(page: pymupdf.Page) -> str:
+    """
+    Hash of what determines a page's markdown: its content stream, size,
+    links, the resources it draws (images by content, fonts by object) and
+    the extractor. A changed link target or swapped image re-extracts the page.
+    """
+    doc = page.parent
+    digest = hashlib.sha256(EXTRACTOR_VERSION.encode())
+    digest.update(repr(tuple(page.rect)).encode())
+    digest.update(page.read_contents())
+    for link in page.get_links():
+        digest.update(repr(sorted((key, str(value)) for key, value in link.items())).encode())
+    for image in page.get_images(full=True):
+        digest.update(f"image {image[0]} {doc.xref_object(image[0], compressed=True)}".encode())
+        digest.update(doc.xref_stream_raw(image[0]) or b"")
+    for font in page.get_fonts(full=True):
+        digest.update(f"font {font[0]} {doc.xref_object(font[0], compressed=True)}".encode())
+    return digest.hexdigest()[:16]
+
+
+def load_pages(path: Path) -> Dict[str, Dict]:
+    """Previously extracted pages by hash (a truncated last line from an interrupted run is skipped)"""
+    pages = {}
+    if not path.exists():
+        return pages
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            pages[record["hash"]] = record
+    return pages
+
+
+def extract_pages(pdf_path: Path, known: Dict[str, Dict]) -> Iterator[Tuple[Dict, bool]]:
+    """Yield (page record, reused) in page order, extracting only pages not in known"""
+    doc = pymupdf.open(str(pdf_path))
+    try:
+        for page in doc:
+            digest = page_hash(page)
+            if digest in known:
+                yield {**known[digest], "page": page.number}, True
+                continue
+
+            md_text = pymupdf4llm.to_markdown(doc, pages=[page.number])
+            yield {
+                "page": page.number,
+                "hash": digest,
+                "markdown": md_text,
+                "sections": split_sections(md_text)
+            }, False
+    finally:
+        doc.close()
+
+
+def extract_cv_to_json(pdf_path: Path, pages_path: Path = PAGES_PATH, force: bool = False) -> Tuple[dict, int]:
+    """Extract CV from PDF to structured JSON, re-extracting only changed pages (returns data, pages extracted)"""
+    print(f"Extracting CV from {pdf_path}...")
+    known = {} if force else load_pages(pages_path)
+
+    # Stream page records into the page store as they are extracted
+    records = []
+    extracted = 0
+    tmp_path = pages_path.with_suffix(".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for record, reused in extract_pages(pdf_path, known):
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            records.append(record)
+            if not reused:
+                extracted += 1
+                print(f"  page {record['page'] + 1}: extracted ({len(record['sections'])} sections)")
+    os.replace(tmp_path, pages_path)
+
+    md_text = "".join(record["markdown"] for record in records)
+    sections = [section for record in records for section in record["sections"]]
 
     # Create structured JSON
     cv_data = {
         "full_text": md_text,
         "sections": sections,
         "metadata": {
-            "source": "CV_LinkedIn.pdf",
+            "source": pdf_path.name,
             "total_sections": len(sections),
-            "characters": len(md_text)
+            "characters": len(md_text),
+            "pages": [
+                {"page": record["page"], "hash": record["hash"], "sections": len(record["sections"])}
+                for record in records
+            ]
         }
     }
 
-    return cv_data
+    return cv_data, extracted
+
 
 def main():
     """Main extraction pipeline"""
+    parser = argparse.ArgumentParser(description="Extract the CV PDF to cv_data.json")
+    parser.add_argument("--pdf", type=Path, default=CV_PATH, help="PDF to extract")
+    parser.add_argument("--force", action="store_true", help="re-extract every page")
+    args = parser.parse_args()
+
     # Extract CV to JSON
-    cv_data = extract_cv_to_json(CV_PATH)
+    start = time.perf_counter()
+    cv_data, extracted = extract_cv_to_json(args.pdf, force=args.force)
+    metadata = cv_data['metadata']
 
     print(f"Extracted CV:")
-    print(f"  Total sections: {cv_data['metadata']['total_sections']}")
-    print(f"  Total characters: {cv_data['metadata']['characters']}")
+    print(f"  Pages re-extracted: {extracted} of {len(metadata['pages'])}")
+    print(f"  Total sections: {metadata['total_sections']}")
+    print(f"  Total characters: {metadata['characters']}")
+
+    # Only rewrite the corpus when it changed (its hash is the index version)
+    previous = None
+    if OUTPUT_PATH.exists():
+        with open(OUTPUT_PATH, encoding='utf-8') as f:
+            previous = json.load(f)
+    if previous == cv_data:
+        print(f"\n✓ Unchanged: {OUTPUT_PATH} ({time.perf_counter() - start:.2f}s)")
+        return
 
     # Save to JSON
     print(f"\nSaving to {OUTPUT_PATH}...")
-    with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
+    tmp_path = OUTPUT_PATH.with_suffix(".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
         json.dump(cv_data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, OUTPUT_PATH)
 
-    print(f"✓ Done!")
+    print(f"✓ Done! ({time.perf_counter() - start:.2f}s)")
     print(f"  Output: {OUTPUT_PATH}")
     print(f"  Size: {OUTPUT_PATH.stat().st_size / 1024:.1f} KB")
 
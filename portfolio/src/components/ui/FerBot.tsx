@@ -9,6 +9,10 @@ import { track } from '@vercel/analytics';
 import gsap from 'gsap';
 import './FerBot.css';
 
+// Warm the backend while the user types (server skips texts under 12 chars)
+const PREFETCH_DEBOUNCE_MS = 600;
+const PREFETCH_MIN_CHARS = 12;
+
 interface Message {
     role: 'user' | 'assistant';
     content: string;
@@ -25,6 +29,7 @@ export const FerBot: React.FC = () => {
     const chatRef = useRef<HTMLDivElement>(null);
     const messagesEndRef = useRef<HTMLDivElement>(null);
     const buttonRef = useRef<HTMLButtonElement>(null);
+    const lastPrefetchRef = useRef('');
 
     // Welcome message on first open
     useEffect(() => {
@@ -87,6 +92,27 @@ export const FerBot: React.FC = () => {
         }
     }, [isOpen]);
 
+    // Debounced prefetch of the question being typed (best effort, errors ignored)
+    useEffect(() => {
+        const question = input.trim();
+        if (!isOpen || isLoading || question.length < PREFETCH_MIN_CHARS || question === lastPrefetchRef.current) {
+            return;
+        }
+
+        const timer = setTimeout(() => {
+            lastPrefetchRef.current = question;
+            fetch('/api/ferbot/prefetch', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ question, language: i18n.language })
+            }).catch(() => undefined);
+        }, PREFETCH_DEBOUNCE_MS);
+
+        return () => clearTimeout(timer);
+    }, [input, isOpen, isLoading, i18n.language]);
+
     const handleSendMessage = async () => {
         if (!input.trim() || isLoading) return;
 
@@ -101,9 +127,9 @@ export const FerBot: React.FC = () => {
         setIsLoading(true);
 
         try {
-            // Build conversation history (exclude welcome message, last 6 messages)
-            const allMessages = [...messages, userMessage];
-            const conversationHistory = allMessages
+            // Build conversation history (previous turns only: exclude welcome message
+            // and the question being sent, last 6 messages)
+            const conversationHistory = messages
                 .slice(1) // Skip welcome message (first assistant message)
                 .slice(-6) // Keep only last 6 messages
                 .map(({ role, content }) => ({ role, content }));